@@ -0,0 +1,237 @@
+import asyncio
+import contextvars
+import json
+import random
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from bson import json_util
+from pymongo import monitoring
+
+# Commands MongoDB can explain; only these keep their full command document
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+
+_current_capture: contextvars.ContextVar[Optional["RequestCapture"]] = contextvars.ContextVar(
+    "current_capture", default=None
+)
+
+
+def _to_json(document: Any) -> Any:
+    # Mongo documents can hold bson types (ObjectId, Int64, ...) that JSON can't
+    return json.loads(json_util.dumps(document))
+
+
+def _from_json(document: Any) -> Any:
+    # Inverse of _to_json: restores bson types from their extended JSON form
+    return json_util.loads(json.dumps(document))
+
+
+class StackSampler:
+    """Samples the Python stack of one thread at a fixed interval.
+
+    The event loop runs every in-flight request on the same thread, so samples taken while
+    several requests overlap are attributed to whichever coroutine happened to be running.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_collapse_stack(frame)] += 1
+
+
+def _collapse_stack(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class RequestCapture:
+    def __init__(self, method: str, path: str, profiled: bool):
+        self.id = str(uuid.uuid4())
+        self.method = method
+        self.path = path
+        self.profiled = profiled
+        self.started_at = datetime.utcnow()
+        self.duration_ms: Optional[float] = None
+        self.status_code: Optional[int] = None
+        self.mongo_commands: List[Dict[str, Any]] = []
+        self.stacks: Counter = Counter()
+        self.finished = False
+        self._pending: Dict[int, Dict[str, Any]] = {}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "profiled": self.profiled,
+            "samples": sum(self.stacks.values()),
+            "mongo_commands": self.mongo_commands,
+        }
+
+    def collapsed_stacks(self) -> str:
+        """Render samples in the collapsed format read by flamegraph.pl and speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class MongoCommandRecorder(monitoring.CommandListener):
+    """Records the Mongo commands issued while a request capture is active.
+
+    Motor copies the caller's context into its executor threads, so the capture of the
+    request that issued a command is visible here. Tasks spawned by a request inherit that
+    context too, so commands arriving after the request finished are ignored.
+    """
+
+    def _active_capture(self) -> Optional[RequestCapture]:
+        capture = _current_capture.get()
+        return capture if capture is not None and not capture.finished else None
+
+    def started(self, event):
+        capture = self._active_capture()
+        if capture is None:
+            return
+        record = {"command": event.command_name, "database": event.database_name}
+        if event.command_name in EXPLAINABLE_COMMANDS:
+            record["collection"] = event.command.get(event.command_name)
+            record["body"] = _to_json({
+                key: value for key, value in event.command.items()
+                if not key.startswith("$") and key != "lsid"
+            })
+        capture._pending[event.request_id] = record
+
+    def succeeded(self, event):
+        self._finish(event, ok=True)
+
+    def failed(self, event):
+        self._finish(event, ok=False)
+
+    def _finish(self, event, ok: bool):
+        capture = self._active_capture()
+        if capture is None:
+            return
+        record = capture._pending.pop(event.request_id, None)
+        if record is not None:
+            record["duration_ms"] = event.duration_micros / 1000
+            record["ok"] = ok
+            capture.mongo_commands.append(record)
+
+
+class RequestProfiler:
+    """Selects requests to profile and keeps a ring buffer of captured ones.
+
+    A request is profiled when it carries the profile header together with the admin token,
+    or is picked by the sample rate. Requests slower than slow_request_ms are captured even
+    when unprofiled, with their Mongo commands; set profile_slow_requests to profile every
+    request so slow ones carry stacks.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 0.0,
+        slow_request_ms: float = 0.0,
+        slow_query_ms: float = 100.0,
+        profile_slow_requests: bool = False,
+        header: str = "X-Profile",
+        admin_header: str = "X-Admin-Token",
+        admin_token: Optional[str] = None,
+        buffer_size: int = 50,
+        sample_interval: float = 0.005,
+        explain: Optional[Callable[[str, Dict[str, Any]], Awaitable[Optional[dict]]]] = None,
+    ):
+        self.sample_rate = sample_rate
+        self.slow_request_ms = slow_request_ms
+        self.slow_query_ms = slow_query_ms
+        self.profile_slow_requests = profile_slow_requests
+        self.header = header
+        self.admin_header = admin_header
+        self.admin_token = admin_token
+        self.sample_interval = sample_interval
+        self.explain = explain
+        self.captures: Deque[RequestCapture] = deque(maxlen=buffer_size)
+        self._finalizers = set()
+
+    def is_admin(self, request) -> bool:
+        token = request.headers.get(self.admin_header)
+        return bool(self.admin_token and token and secrets.compare_digest(token, self.admin_token))
+
+    def should_profile(self, request) -> bool:
+        if request.headers.get(self.header, "").lower() in ("1", "true", "yes") and self.is_admin(request):
+            return True
+        if self.profile_slow_requests and self.slow_request_ms > 0:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, request, call_next):
+        profiled = self.should_profile(request)
+        if not profiled and self.slow_request_ms <= 0:
+            return await call_next(request)
+
+        capture = RequestCapture(request.method, request.url.path, profiled)
+        token = _current_capture.set(capture)
+        sampler = None
+        if profiled:
+            sampler = StackSampler(threading.get_ident(), self.sample_interval)
+            sampler.start()
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+            capture.status_code = response.status_code
+            return response
+        finally:
+            capture.duration_ms = (time.perf_counter() - start) * 1000
+            capture.finished = True
+            if sampler is not None:
+                sampler.stop()
+                capture.stacks = sampler.stacks
+            _current_capture.reset(token)
+            if profiled or capture.duration_ms >= self.slow_request_ms:
+                # Explain slow queries off the request path
+                finalizer = asyncio.create_task(self._store(capture))
+                self._finalizers.add(finalizer)
+                finalizer.add_done_callback(self._finalizers.discard)
+
+    async def _store(self, capture: RequestCapture):
+        for record in capture.mongo_commands:
+            if "body" not in record:
+                continue
+            if self.explain is not None and record["duration_ms"] >= self.slow_query_ms:
+                try:
+                    plan = await self.explain(record["database"], _from_json(record["body"]))
+                    record["explain"] = _to_json(plan) if plan is not None else None
+                except Exception as exc:
+                    record["explain"] = {"error": str(exc)}
+        self.captures.append(capture)
+
+    def get(self, capture_id: str) -> Optional[RequestCapture]:
+        for capture in self.captures:
+            if capture.id == capture_id:
+                return capture
+        return None
@@ -0,0 +1,741 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, ReturnDocument, UpdateOne
+
+# Repositories work on plain documents (dicts), exactly as they are stored.
+# Routes turn them into pydantic models.
+
+COMPLETED_STATUS = "completed"
+TASK_INDEXED_FIELDS = ("status", "priority", "category_id")
+TASK_ORDER_FIELDS = ("created_at", "position")
+
+
+def _merge_sorted(tasks: List[dict], sort: str, limit: Optional[int]) -> List[dict]:
+    if sort == "position":
+        tasks = sorted(tasks, key=lambda t: (t.get("position") is not None, t.get("position") or ""))
+    else:
+        tasks = sorted(tasks, key=lambda t: t["created_at"], reverse=True)
+    return tasks[:limit] if limit is not None else tasks
+
+
+# Repository interfaces
+class UserRepo(ABC):
+    async def ensure_indexes(self):
+        pass
+
+    @abstractmethod
+    async def get(self, user_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def find_by_email(self, email: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def insert(self, user: dict):
+        ...
+
+
+class CategoryRepo(ABC):
+    async def ensure_indexes(self):
+        pass
+
+    @abstractmethod
+    async def insert(self, category: dict):
+        ...
+
+    @abstractmethod
+    async def get(self, user_id: str, category_id: str) -> Optional[dict]:
+        """Return a category unless it is missing or being deleted."""
+
+    @abstractmethod
+    async def list(self, user_id: str, limit: int = 1000) -> List[dict]:
+        """Return the user's categories, leaving out ones being deleted."""
+
+    @abstractmethod
+    async def increment_counts(self, user_id: str, category_id: str, tasks: int, completed: int):
+        """Adjust the task_count and completed_count stored on a category.
+
+        Categories without counts yet are left alone; backfilling gives them exact counts.
+        """
+
+    @abstractmethod
+    async def set_counts(self, user_id: str, category_id: str, tasks: int, completed: int):
+        ...
+
+    @abstractmethod
+    async def mark_deleting(
+        self, user_id: str, category_id: str, reassign_to: Optional[str]
+    ) -> Optional[dict]:
+        """Flag a category for deletion and return it, or None if missing or already flagged."""
+
+    @abstractmethod
+    async def list_deleting(self) -> List[dict]:
+        """Return every category flagged for deletion, across all users."""
+
+    @abstractmethod
+    async def list_missing_counts(self) -> List[dict]:
+        """Return every category created before counts were kept, across all users."""
+
+    @abstractmethod
+    async def delete(self, user_id: str, category_id: str) -> bool:
+        ...
+
+
+class TaskRepo(ABC):
+    async def ensure_indexes(self):
+        pass
+
+    @abstractmethod
+    async def insert(self, task: dict):
+        ...
+
+    @abstractmethod
+    async def get(self, user_id: str, task_id: str) -> Optional[dict]:
+        """Return a task from the hot tier only."""
+
+    @abstractmethod
+    async def list(
+        self,
+        user_id: str,
+        filters: Optional[Dict[str, Any]] = None,
+        include_archived: bool = False,
+        limit: Optional[int] = 1000,
+        sort: str = "created_at",
+    ) -> List[dict]:
+        """Return the user's tasks filtered by status/priority/category_id.
+
+        sort is "created_at" (newest first) or "position" (manual order, unranked first).
+        """
+
+    @abstractmethod
+    async def first_position(self, user_id: str) -> Optional[str]:
+        """Return the smallest position key among the user's hot-tier tasks."""
+
+    @abstractmethod
+    async def set_positions(self, user_id: str, positions: Dict[str, str]):
+        """Write position keys for many tasks at once, keyed by task id."""
+
+    @abstractmethod
+    async def update(self, task_id: str, fields: Dict[str, Any]) -> Optional[Tuple[dict, dict]]:
+        """Apply fields to a hot-tier task, returning (before, after) as seen by that one write."""
+
+    @abstractmethod
+    async def delete(self, user_id: str, task_id: str) -> Optional[dict]:
+        """Delete a task from whichever tier holds it, returning the deleted document."""
+
+    @abstractmethod
+    async def count_by_category(self, user_id: str, category_id: str) -> Tuple[int, int]:
+        """Return (total, completed) task counts for a category across both tiers."""
+
+    @abstractmethod
+    async def reassign_category_batch(
+        self, user_id: str, category_id: str, new_category_id: Optional[str], batch_size: int
+    ) -> Tuple[int, int]:
+        """Point up to batch_size tasks of a category at new_category_id.
+
+        Returns (moved, completed among moved); (0, 0) means no tasks are left.
+        """
+
+    @abstractmethod
+    async def restore_archived(self, user_id: str, task_id: str) -> Optional[dict]:
+        """Move an archived task back into the hot tier, returning it if it existed."""
+
+    @abstractmethod
+    async def archive_batch(self, cutoff: datetime, batch_size: int) -> int:
+        """Move up to batch_size tasks completed and untouched since cutoff to the archive."""
+
+
+class NotificationRepo(ABC):
+    async def ensure_indexes(self):
+        pass
+
+    @abstractmethod
+    async def insert(self, notification: dict):
+        ...
+
+    @abstractmethod
+    async def list_recent(self, user_id: str, limit: int = 50) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def mark_read(self, user_id: str, notification_id: str):
+        ...
+
+    @abstractmethod
+    async def delete(self, user_id: str, notification_id: str) -> bool:
+        ...
+
+
+# MongoDB backend
+class MongoUserRepo(UserRepo):
+    def __init__(self, db):
+        self.users = db.users
+
+    async def ensure_indexes(self):
+        await self.users.create_index("id")
+        await self.users.create_index("email")
+
+    async def get(self, user_id: str) -> Optional[dict]:
+        return await self.users.find_one({"id": user_id})
+
+    async def find_by_email(self, email: str) -> Optional[dict]:
+        return await self.users.find_one({"email": email})
+
+    async def insert(self, user: dict):
+        await self.users.insert_one(dict(user))
+
+
+class MongoCategoryRepo(CategoryRepo):
+    def __init__(self, db):
+        self.categories = db.categories
+
+    async def ensure_indexes(self):
+        await self.categories.create_index([("user_id", 1), ("created_at", -1)])
+
+    async def insert(self, category: dict):
+        await self.categories.insert_one(dict(category))
+
+    async def get(self, user_id: str, category_id: str) -> Optional[dict]:
+        return await self.categories.find_one(
+            {"id": category_id, "user_id": user_id, "deleting": {"$ne": True}}
+        )
+
+    async def list(self, user_id: str, limit: int = 1000) -> List[dict]:
+        return await self.categories.find(
+            {"user_id": user_id, "deleting": {"$ne": True}}
+        ).to_list(limit)
+
+    async def increment_counts(self, user_id: str, category_id: str, tasks: int, completed: int):
+        await self.categories.update_one(
+            {"id": category_id, "user_id": user_id, "task_count": {"$exists": True}},
+            {"$inc": {"task_count": tasks, "completed_count": completed}}
+        )
+
+    async def set_counts(self, user_id: str, category_id: str, tasks: int, completed: int):
+        await self.categories.update_one(
+            {"id": category_id, "user_id": user_id},
+            {"$set": {"task_count": tasks, "completed_count": completed}}
+        )
+
+    async def mark_deleting(
+        self, user_id: str, category_id: str, reassign_to: Optional[str]
+    ) -> Optional[dict]:
+        return await self.categories.find_one_and_update(
+            {"id": category_id, "user_id": user_id, "deleting": {"$ne": True}},
+            {"$set": {"deleting": True, "reassign_to": reassign_to}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def list_deleting(self) -> List[dict]:
+        return await self.categories.find({"deleting": True}).to_list(None)
+
+    async def list_missing_counts(self) -> List[dict]:
+        return await self.categories.find({"task_count": {"$exists": False}}).to_list(None)
+
+    async def delete(self, user_id: str, category_id: str) -> bool:
+        result = await self.categories.delete_one({"id": category_id, "user_id": user_id})
+        return result.deleted_count > 0
+
+
+class MongoTaskRepo(TaskRepo):
+    def __init__(self, db):
+        self.tasks = db.tasks
+        self.archive = db.tasks_archive
+
+    async def ensure_indexes(self):
+        await self.tasks.create_index([("user_id", 1), ("created_at", -1)])
+        await self.tasks.create_index([("status", 1), ("completed_at", 1)])
+        await self.tasks.create_index([("user_id", 1), ("position", 1)])
+        await self.tasks.create_index([("user_id", 1), ("status", 1), ("position", 1)])
+        await self.tasks.create_index([("user_id", 1), ("category_id", 1), ("position", 1)])
+        await self.archive.create_index([("user_id", 1), ("created_at", -1)])
+
+    async def insert(self, task: dict):
+        await self.tasks.insert_one(dict(task))
+
+    async def get(self, user_id: str, task_id: str) -> Optional[dict]:
+        return await self.tasks.find_one({"id": task_id, "user_id": user_id})
+
+    async def list(
+        self,
+        user_id: str,
+        filters: Optional[Dict[str, Any]] = None,
+        include_archived: bool = False,
+        limit: Optional[int] = 1000,
+        sort: str = "created_at",
+    ) -> List[dict]:
+        query = {"user_id": user_id, **(filters or {})}
+        direction = 1 if sort == "position" else -1
+        tasks = await self.tasks.find(query).sort(sort, direction).to_list(limit)
+        if include_archived:
+            # A task caught mid-move can briefly exist in both tiers, so the hot copy wins
+            archived = await self.archive.find(query).sort(sort, direction).to_list(limit)
+            hot_ids = {t["id"] for t in tasks}
+            tasks = _merge_sorted(
+                tasks + [t for t in archived if t["id"] not in hot_ids], sort, limit
+            )
+        return tasks
+
+    async def first_position(self, user_id: str) -> Optional[str]:
+        task = await self.tasks.find_one(
+            {"user_id": user_id, "position": {"$gt": ""}},
+            {"position": 1},
+            sort=[("position", 1)]
+        )
+        return task["position"] if task else None
+
+    async def set_positions(self, user_id: str, positions: Dict[str, str]):
+        if not positions:
+            return
+        await self.tasks.bulk_write(
+            [
+                UpdateOne({"id": task_id, "user_id": user_id}, {"$set": {"position": position}})
+                for task_id, position in positions.items()
+            ],
+            ordered=False
+        )
+
+    async def update(self, task_id: str, fields: Dict[str, Any]) -> Optional[Tuple[dict, dict]]:
+        before = await self.tasks.find_one_and_update(
+            {"id": task_id}, {"$set": fields}, return_document=ReturnDocument.BEFORE
+        )
+        if before is None:
+            return None
+        # $set of top-level fields: the updated document is the pre-image plus fields
+        return before, {**before, **fields}
+
+    async def delete(self, user_id: str, task_id: str) -> Optional[dict]:
+        task = await self.tasks.find_one_and_delete({"id": task_id, "user_id": user_id})
+        if task is None:
+            task = await self.archive.find_one_and_delete({"id": task_id, "user_id": user_id})
+        return task
+
+    async def count_by_category(self, user_id: str, category_id: str) -> Tuple[int, int]:
+        total = completed = 0
+        for collection in (self.tasks, self.archive):
+            query = {"user_id": user_id, "category_id": category_id}
+            total += await collection.count_documents(query)
+            completed += await collection.count_documents({**query, "status": COMPLETED_STATUS})
+        return total, completed
+
+    async def reassign_category_batch(
+        self, user_id: str, category_id: str, new_category_id: Optional[str], batch_size: int
+    ) -> Tuple[int, int]:
+        query = {"user_id": user_id, "category_id": category_id}
+        update = {"$set": {"category_id": new_category_id}}
+        for collection in (self.tasks, self.archive):
+            while True:
+                batch = await collection.find(query, {"_id": 1}).limit(batch_size).to_list(batch_size)
+                if not batch:
+                    break
+                # Re-apply the predicate on write so tasks edited since the read are counted
+                # as they are now: completed ones first, then the rest
+                in_batch = {**query, "_id": {"$in": [t["_id"] for t in batch]}}
+                completed = await collection.update_many({**in_batch, "status": COMPLETED_STATUS}, update)
+                others = await collection.update_many(in_batch, update)
+                moved = completed.modified_count + others.modified_count
+                if moved:
+                    return moved, completed.modified_count
+        return 0, 0
+
+    async def restore_archived(self, user_id: str, task_id: str) -> Optional[dict]:
+        task = await self.archive.find_one({"id": task_id, "user_id": user_id})
+        if task is None:
+            return None
+        await self.tasks.replace_one({"_id": task["_id"]}, task, upsert=True)
+        await self.archive.delete_one({"_id": task["_id"]})
+        return task
+
+    async def archive_batch(self, cutoff: datetime, batch_size: int) -> int:
+        # Upsert into the archive before deleting, so an interrupted batch can be repeated
+        query = {
+            "status": COMPLETED_STATUS,
+            "completed_at": {"$lt": cutoff},
+            "updated_at": {"$lt": cutoff},
+        }
+        batch = await self.tasks.find(query).limit(batch_size).to_list(batch_size)
+        if not batch:
+            return 0
+        await self.archive.bulk_write(
+            [ReplaceOne({"_id": t["_id"]}, t, upsert=True) for t in batch],
+            ordered=False
+        )
+        # Re-check the predicate on each delete so a task edited since it was read stays hot
+        # and one deleted since it was read is not resurrected
+        not_moved = []
+        for task in batch:
+            if await self.tasks.find_one_and_delete({"_id": task["_id"], **query}, {"_id": 1}) is None:
+                not_moved.append(task["_id"])
+        if not_moved:
+            # Only documents this batch removed keep their archive copy
+            await self.archive.delete_many({"_id": {"$in": not_moved}})
+        return len(batch) - len(not_moved)
+
+
+class MongoNotificationRepo(NotificationRepo):
+    def __init__(self, db):
+        self.notifications = db.notifications
+
+    async def ensure_indexes(self):
+        await self.notifications.create_index([("user_id", 1), ("created_at", -1)])
+
+    async def insert(self, notification: dict):
+        await self.notifications.insert_one(dict(notification))
+
+    async def list_recent(self, user_id: str, limit: int = 50) -> List[dict]:
+        return await self.notifications.find(
+            {"user_id": user_id}
+        ).sort("created_at", -1).limit(limit).to_list(limit)
+
+    async def mark_read(self, user_id: str, notification_id: str):
+        await self.notifications.update_one(
+            {"id": notification_id, "user_id": user_id},
+            {"$set": {"read": True}}
+        )
+
+    async def delete(self, user_id: str, notification_id: str) -> bool:
+        result = await self.notifications.delete_one({"id": notification_id, "user_id": user_id})
+        return result.deleted_count > 0
+
+
+# In-memory backend
+# find() sorts the filtered ids directly when they are this many times fewer than the user's documents
+_CANDIDATE_SORT_RATIO = 8
+
+
+def _order_key(value: Any, doc_id: str) -> Tuple:
+    # Missing values sort first, as they do in MongoDB
+    return (0, "", doc_id) if value is None else (1, value, doc_id)
+
+
+class _IndexedStore:
+    """Documents keyed by id, ordered per user by each order field, with per-user equality indexes.
+
+    Documents are copied on the way in and out so callers never share state with the store.
+    """
+
+    def __init__(
+        self,
+        indexed_fields: Tuple[str, ...] = (),
+        order_fields: Tuple[str, ...] = ("created_at",),
+    ):
+        self._docs: Dict[str, dict] = {}
+        self._ordered: Dict[str, Dict[str, List[Tuple]]] = {
+            field: defaultdict(list) for field in order_fields
+        }
+        self._indexes: Dict[str, Dict[Tuple[str, Any], Set[str]]] = {
+            field: defaultdict(set) for field in indexed_fields
+        }
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def insert(self, doc: dict):
+        doc = dict(doc)
+        self._docs[doc["id"]] = doc
+        for field, by_user in self._ordered.items():
+            insort(by_user[doc["user_id"]], _order_key(doc.get(field), doc["id"]))
+        for field, index in self._indexes.items():
+            index[(doc["user_id"], doc.get(field))].add(doc["id"])
+
+    def get(self, doc_id: str, user_id: Optional[str] = None) -> Optional[dict]:
+        doc = self._docs.get(doc_id)
+        if doc is None or (user_id is not None and doc["user_id"] != user_id):
+            return None
+        return dict(doc)
+
+    def remove(self, doc_id: str, user_id: Optional[str] = None) -> Optional[dict]:
+        if self.get(doc_id, user_id) is None:
+            return None
+        doc = self._docs.pop(doc_id)
+        for field, by_user in self._ordered.items():
+            entries = by_user[doc["user_id"]]
+            del entries[bisect_left(entries, _order_key(doc.get(field), doc_id))]
+            if not entries:
+                del by_user[doc["user_id"]]
+        for field, index in self._indexes.items():
+            key = (doc["user_id"], doc.get(field))
+            index[key].discard(doc_id)
+            if not index[key]:
+                del index[key]
+        return doc
+
+    def update(self, doc_id: str, fields: Dict[str, Any]) -> Optional[dict]:
+        doc = self.remove(doc_id)
+        if doc is None:
+            return None
+        doc.update(fields)
+        self.insert(doc)
+        return dict(doc)
+
+    def all(self) -> List[dict]:
+        return [dict(doc) for doc in self._docs.values()]
+
+    def user_ids(self) -> List[str]:
+        by_user = next(iter(self._ordered.values()))
+        return list(by_user)
+
+    def ids_where(self, user_id: str, field: str, value: Any) -> Set[str]:
+        return self._indexes[field].get((user_id, value), set())
+
+    def first_value(self, user_id: str, field: str) -> Any:
+        """Return the smallest non-missing value of an order field for the user."""
+        entries = self._ordered[field].get(user_id, [])
+        i = bisect_left(entries, (1,))
+        return entries[i][1] if i < len(entries) else None
+
+    def find(
+        self,
+        user_id: str,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        order_by: str = "created_at",
+        descending: bool = True,
+    ) -> List[dict]:
+        """Return the user's documents in order_by order, filtered through the equality indexes."""
+        candidates: Optional[Set[str]] = None
+        for field, value in (filters or {}).items():
+            ids = self.ids_where(user_id, field, value)
+            candidates = ids if candidates is None else candidates & ids
+
+        entries = self._ordered[order_by].get(user_id, [])
+        if candidates is not None and len(candidates) * _CANDIDATE_SORT_RATIO < len(entries):
+            ordered = sorted(
+                (self._docs[doc_id] for doc_id in candidates),
+                key=lambda doc: _order_key(doc.get(order_by), doc["id"]),
+                reverse=descending,
+            )
+            return [dict(doc) for doc in ordered[:limit]]
+
+        results = []
+        for entry in (reversed(entries) if descending else entries):
+            if limit is not None and len(results) >= limit:
+                break
+            doc_id = entry[2]
+            if candidates is None or doc_id in candidates:
+                results.append(dict(self._docs[doc_id]))
+        return results
+
+
+class MemoryUserRepo(UserRepo):
+    def __init__(self):
+        self._by_id: Dict[str, dict] = {}
+        self._by_email: Dict[str, str] = {}
+
+    async def get(self, user_id: str) -> Optional[dict]:
+        user = self._by_id.get(user_id)
+        return dict(user) if user else None
+
+    async def find_by_email(self, email: str) -> Optional[dict]:
+        user_id = self._by_email.get(email)
+        return await self.get(user_id) if user_id else None
+
+    async def insert(self, user: dict):
+        self._by_id[user["id"]] = dict(user)
+        self._by_email[user["email"]] = user["id"]
+
+
+class MemoryCategoryRepo(CategoryRepo):
+    def __init__(self):
+        self.categories = _IndexedStore()
+
+    async def insert(self, category: dict):
+        self.categories.insert(category)
+
+    async def get(self, user_id: str, category_id: str) -> Optional[dict]:
+        category = self.categories.get(category_id, user_id)
+        return category if category and not category.get("deleting") else None
+
+    async def list(self, user_id: str, limit: int = 1000) -> List[dict]:
+        # Creation order, like MongoDB's natural order for the Mongo backend
+        user_categories = self.categories.find(user_id, descending=False)
+        return [c for c in user_categories if not c.get("deleting")][:limit]
+
+    async def increment_counts(self, user_id: str, category_id: str, tasks: int, completed: int):
+        category = self.categories.get(category_id, user_id)
+        if category is not None and "task_count" in category:
+            self.categories.update(category_id, {
+                "task_count": category["task_count"] + tasks,
+                "completed_count": category["completed_count"] + completed,
+            })
+
+    async def set_counts(self, user_id: str, category_id: str, tasks: int, completed: int):
+        if self.categories.get(category_id, user_id) is not None:
+            self.categories.update(category_id, {"task_count": tasks, "completed_count": completed})
+
+    async def mark_deleting(
+        self, user_id: str, category_id: str, reassign_to: Optional[str]
+    ) -> Optional[dict]:
+        if await self.get(user_id, category_id) is None:
+            return None
+        return self.categories.update(category_id, {"deleting": True, "reassign_to": reassign_to})
+
+    async def list_deleting(self) -> List[dict]:
+        return [c for c in self.categories.all() if c.get("deleting")]
+
+    async def list_missing_counts(self) -> List[dict]:
+        return [c for c in self.categories.all() if "task_count" not in c]
+
+    async def delete(self, user_id: str, category_id: str) -> bool:
+        return self.categories.remove(category_id, user_id) is not None
+
+
+class MemoryTaskRepo(TaskRepo):
+    def __init__(self):
+        self.tasks = _IndexedStore(TASK_INDEXED_FIELDS, TASK_ORDER_FIELDS)
+        self.archive = _IndexedStore(TASK_INDEXED_FIELDS, TASK_ORDER_FIELDS)
+
+    async def insert(self, task: dict):
+        self.tasks.insert(task)
+
+    async def get(self, user_id: str, task_id: str) -> Optional[dict]:
+        return self.tasks.get(task_id, user_id)
+
+    async def list(
+        self,
+        user_id: str,
+        filters: Optional[Dict[str, Any]] = None,
+        include_archived: bool = False,
+        limit: Optional[int] = 1000,
+        sort: str = "created_at",
+    ) -> List[dict]:
+        descending = sort != "position"
+        tasks = self.tasks.find(user_id, filters, limit, order_by=sort, descending=descending)
+        if include_archived:
+            archived = self.archive.find(user_id, filters, limit, order_by=sort, descending=descending)
+            tasks = _merge_sorted(tasks + archived, sort, limit)
+        return tasks
+
+    async def first_position(self, user_id: str) -> Optional[str]:
+        return self.tasks.first_value(user_id, "position")
+
+    async def set_positions(self, user_id: str, positions: Dict[str, str]):
+        for task_id, position in positions.items():
+            if self.tasks.get(task_id, user_id) is not None:
+                self.tasks.update(task_id, {"position": position})
+
+    async def update(self, task_id: str, fields: Dict[str, Any]) -> Optional[Tuple[dict, dict]]:
+        before = self.tasks.get(task_id)
+        if before is None:
+            return None
+        return before, self.tasks.update(task_id, fields)
+
+    async def delete(self, user_id: str, task_id: str) -> Optional[dict]:
+        return self.tasks.remove(task_id, user_id) or self.archive.remove(task_id, user_id)
+
+    async def count_by_category(self, user_id: str, category_id: str) -> Tuple[int, int]:
+        total = completed = 0
+        for store in (self.tasks, self.archive):
+            ids = store.ids_where(user_id, "category_id", category_id)
+            total += len(ids)
+            completed += len(ids & store.ids_where(user_id, "status", COMPLETED_STATUS))
+        return total, completed
+
+    async def reassign_category_batch(
+        self, user_id: str, category_id: str, new_category_id: Optional[str], batch_size: int
+    ) -> Tuple[int, int]:
+        for store in (self.tasks, self.archive):
+            batch = store.find(user_id, {"category_id": category_id}, limit=batch_size)
+            if batch:
+                for task in batch:
+                    store.update(task["id"], {"category_id": new_category_id})
+                return len(batch), len([t for t in batch if t["status"] == COMPLETED_STATUS])
+        return 0, 0
+
+    async def restore_archived(self, user_id: str, task_id: str) -> Optional[dict]:
+        task = self.archive.remove(task_id, user_id)
+        if task is None:
+            return None
+        self.tasks.insert(task)
+        return task
+
+    async def archive_batch(self, cutoff: datetime, batch_size: int) -> int:
+        moved = 0
+        for user_id in self.tasks.user_ids():
+            for task_id in list(self.tasks.ids_where(user_id, "status", COMPLETED_STATUS)):
+                if moved >= batch_size:
+                    return moved
+                task = self.tasks.get(task_id)
+                if task.get("completed_at") and task["completed_at"] < cutoff and task["updated_at"] < cutoff:
+                    self.archive.insert(self.tasks.remove(task_id))
+                    moved += 1
+        return moved
+
+
+class MemoryNotificationRepo(NotificationRepo):
+    def __init__(self):
+        self.notifications = _IndexedStore()
+
+    async def insert(self, notification: dict):
+        self.notifications.insert(notification)
+
+    async def list_recent(self, user_id: str, limit: int = 50) -> List[dict]:
+        return self.notifications.find(user_id, limit=limit)
+
+    async def mark_read(self, user_id: str, notification_id: str):
+        if self.notifications.get(notification_id, user_id) is not None:
+            self.notifications.update(notification_id, {"read": True})
+
+    async def delete(self, user_id: str, notification_id: str) -> bool:
+        return self.notifications.remove(notification_id, user_id) is not None
+
+
+# Storage container
+class Storage:
+    def __init__(
+        self,
+        users: UserRepo,
+        tasks: TaskRepo,
+        categories: CategoryRepo,
+        notifications: NotificationRepo,
+        client: Optional[AsyncIOMotorClient] = None,
+    ):
+        self.users = users
+        self.tasks = tasks
+        self.categories = categories
+        self.notifications = notifications
+        self.client = client
+
+    async def ensure_indexes(self):
+        for repo in (self.users, self.tasks, self.categories, self.notifications):
+            await repo.ensure_indexes()
+
+    async def explain(self, database_name: str, command: Dict[str, Any]) -> Optional[dict]:
+        """Return the query plan for a recorded Mongo command (None for non-Mongo backends)."""
+        if self.client is None:
+            return None
+        result = await self.client[database_name].command(
+            {"explain": command, "verbosity": "queryPlanner"}
+        )
+        return result.get("queryPlanner")
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+
+
+def create_mongo_storage(mongo_url: str, db_name: str, event_listeners: Sequence = ()) -> Storage:
+    client = AsyncIOMotorClient(mongo_url, event_listeners=list(event_listeners))
+    db = client[db_name]
+    return Storage(
+        users=MongoUserRepo(db),
+        tasks=MongoTaskRepo(db),
+        categories=MongoCategoryRepo(db),
+        notifications=MongoNotificationRepo(db),
+        client=client,
+    )
+
+
+def create_memory_storage() -> Storage:
+    return Storage(
+        users=MemoryUserRepo(),
+        tasks=MemoryTaskRepo(),
+        categories=MemoryCategoryRepo(),
+        notifications=MemoryNotificationRepo(),
+    )
@@ -1,11 +1,13 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel, Field, EmailStr
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 import os
+import asyncio
+import contextvars
 import logging
 import bcrypt
 import jwt
@@ -13,24 +15,71 @@ from pathlib import Path
 from dotenv import load_dotenv
 import uuid
 from enum import Enum
+from repositories import (
+    Storage, UserRepo, TaskRepo, CategoryRepo, NotificationRepo,
+    create_mongo_storage, create_memory_storage,
+)
+from profiling import MongoCommandRecorder, RequestProfiler
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Storage backend: "mongo" (default) or "memory" for single-node deployments and tests
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongo')
+if STORAGE_BACKEND == 'memory':
+    storage: Storage = create_memory_storage()
+else:
+    storage = create_mongo_storage(
+        os.environ['MONGO_URL'], os.environ['DB_NAME'], event_listeners=[MongoCommandRecorder()]
+    )
 
 # JWT Configuration
 JWT_SECRET = "your-secret-key-change-in-production"
 JWT_ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_HOURS = 24
 
+# Archive Configuration
+# Completed tasks untouched for ARCHIVE_AFTER_DAYS move from the hot tier to the archive
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 30))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+ARCHIVE_MAX_BATCHES_PER_RUN = int(os.environ.get('ARCHIVE_MAX_BATCHES_PER_RUN', 20))
+ARCHIVE_BATCH_PAUSE_SECONDS = float(os.environ.get('ARCHIVE_BATCH_PAUSE_SECONDS', 1.0))
+ARCHIVE_INTERVAL_SECONDS = float(os.environ.get('ARCHIVE_INTERVAL_SECONDS', 3600))
+
+# Task Ordering Configuration
+# Manual order uses base-62 rank keys; users whose keys grow past RANK_MAX_LENGTH get rebalanced
+RANK_DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+RANK_MAX_LENGTH = int(os.environ.get('RANK_MAX_LENGTH', 24))
+RANK_REBALANCE_INTERVAL_SECONDS = float(os.environ.get('RANK_REBALANCE_INTERVAL_SECONDS', 30))
+
+# Category Deletion Configuration
+CATEGORY_CLEANUP_BATCH_SIZE = int(os.environ.get('CATEGORY_CLEANUP_BATCH_SIZE', 500))
+CATEGORY_CLEANUP_PAUSE_SECONDS = float(os.environ.get('CATEGORY_CLEANUP_PAUSE_SECONDS', 0.1))
+
+# Profiling Configuration
+# Requests are profiled when sent with the X-Profile header (plus a valid X-Admin-Token)
+# or picked by PROFILE_SAMPLE_RATE.
+# Requests slower than SLOW_REQUEST_MS (0 disables) are captured with their Mongo commands.
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 0))
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+PROFILE_SLOW_REQUESTS = os.environ.get('PROFILE_SLOW_REQUESTS', 'false').lower() == 'true'
+PROFILE_BUFFER_SIZE = int(os.environ.get('PROFILE_BUFFER_SIZE', 50))
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
 # Create the main app
 app = FastAPI(title="Taskify - Notion-Style Task Manager", version="1.0.0")
 api_router = APIRouter(prefix="/api")
 security = HTTPBearer()
+profiler = RequestProfiler(
+    sample_rate=PROFILE_SAMPLE_RATE,
+    slow_request_ms=SLOW_REQUEST_MS,
+    slow_query_ms=SLOW_QUERY_MS,
+    profile_slow_requests=PROFILE_SLOW_REQUESTS,
+    buffer_size=PROFILE_BUFFER_SIZE,
+    admin_token=ADMIN_TOKEN,
+    explain=storage.explain,
+)
 
 # Enums
 class TaskStatus(str, Enum):
@@ -44,6 +93,10 @@ class TaskPriority(str, Enum):
     HIGH = "high"
     URGENT = "urgent"
 
+class TaskSort(str, Enum):
+    CREATED_AT = "created_at"
+    POSITION = "position"
+
 class NotificationType(str, Enum):
     DUE_REMINDER = "due_reminder"
     TASK_COMPLETED = "task_completed"
@@ -83,8 +136,20 @@ class Category(BaseModel):
     user_id: str
     name: str
     color: str = "#8B5CF6"  # Default purple
+    # Maintained on every task write, across both task tiers
+    task_count: int = 0
+    completed_count: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class CategoryResponse(BaseModel):
+    id: str
+    user_id: str
+    name: str
+    color: str
+    created_at: datetime
+    task_count: Optional[int] = None
+    completed_count: Optional[int] = None
+
 class CategoryCreate(BaseModel):
     name: str
     color: Optional[str] = "#8B5CF6"
@@ -99,6 +164,7 @@ class Task(BaseModel):
     category_id: Optional[str] = None
     due_date: Optional[datetime] = None
     completed_at: Optional[datetime] = None
+    position: Optional[str] = None  # Rank key for manual ordering
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -117,6 +183,11 @@ class TaskUpdate(BaseModel):
     category_id: Optional[str] = None
     due_date: Optional[datetime] = None
 
+class TaskMove(BaseModel):
+    # Neighbours in the target order; omit one to move to the start or end
+    prev_id: Optional[str] = None
+    next_id: Optional[str] = None
+
 class Notification(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
@@ -138,6 +209,19 @@ class AnalyticsResponse(BaseModel):
     category_stats: List[Dict[str, Any]]
     priority_distribution: Dict[str, int]
 
+# Repository dependencies
+def get_user_repo() -> UserRepo:
+    return storage.users
+
+def get_task_repo() -> TaskRepo:
+    return storage.tasks
+
+def get_category_repo() -> CategoryRepo:
+    return storage.categories
+
+def get_notification_repo() -> NotificationRepo:
+    return storage.notifications
+
 # Helper functions
 def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -160,23 +244,206 @@ def verify_token(token: str):
     except jwt.JWTError:
         raise HTTPException(status_code=401, detail="Could not validate token")
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    users: UserRepo = Depends(get_user_repo)
+):
     payload = verify_token(credentials.credentials)
     user_id = payload.get("sub")
     if user_id is None:
         raise HTTPException(status_code=401, detail="Could not validate token")
     
-    user = await db.users.find_one({"id": user_id})
+    user = await users.get(user_id)
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
     
     return User(**user)
 
+async def verify_admin(request: Request):
+    if not profiler.is_admin(request):
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+# Ordering helpers
+pending_rebalances: set = set()
+
+def rank_between(lower: Optional[str], upper: Optional[str]) -> str:
+    """Return a rank key sorting strictly between lower and upper (None means unbounded).
+
+    Keys never end in the lowest digit, so there is always room to insert before a key.
+    """
+    lower = lower or ""
+    if upper is not None and lower >= upper:
+        raise ValueError(f"Rank {lower!r} is not below {upper!r}")
+
+    if not lower and upper is not None:
+        # New tasks are prepended, so step the first non-zero digit of upper down by one
+        # rather than bisecting: keys grow one digit per len(RANK_DIGITS) - 1 prepends
+        zeros = len(upper) - len(upper.lstrip(RANK_DIGITS[0]))
+        if zeros < len(upper):
+            digit = RANK_DIGITS.index(upper[zeros])
+            if digit > 1:
+                return upper[:zeros] + RANK_DIGITS[digit - 1]
+            return upper[:zeros] + RANK_DIGITS[0] + RANK_DIGITS[-1]
+    
+    prefix = ""
+    i = 0
+    while True:
+        lo = RANK_DIGITS.index(lower[i]) if i < len(lower) else 0
+        hi = RANK_DIGITS.index(upper[i]) if upper is not None and i < len(upper) else len(RANK_DIGITS)
+        if hi - lo > 1:
+            return prefix + RANK_DIGITS[(lo + hi) // 2]
+        prefix += RANK_DIGITS[lo]
+        if hi - lo == 1:
+            # The prefix is now below upper, so only lower constrains the remaining digits
+            upper = None
+        i += 1
+
+def spread_ranks(count: int) -> List[str]:
+    """Return count evenly spaced rank keys of the shortest width that fits them."""
+    base = len(RANK_DIGITS)
+    width = 1
+    while base ** width <= count:
+        width += 1
+    step = base ** width // (count + 1)
+    
+    ranks = []
+    for i in range(1, count + 1):
+        value = i * step
+        digits = []
+        for _ in range(width):
+            value, digit = divmod(value, base)
+            digits.append(RANK_DIGITS[digit])
+        # Trailing zero digits can be dropped without changing the order
+        ranks.append("".join(reversed(digits)).rstrip(RANK_DIGITS[0]))
+    return ranks
+
+async def rebalance_positions(user_id: str):
+    """Rewrite a user's rank keys as short, evenly spaced keys in their current order.
+
+    Tasks that never had a key go first, newest first, matching the default board order.
+    """
+    user_tasks = await storage.tasks.list(user_id, limit=None, sort=TaskSort.POSITION)
+    unranked = sorted(
+        [t for t in user_tasks if not t.get("position")], key=lambda t: t["created_at"], reverse=True
+    )
+    ranked = [t for t in user_tasks if t.get("position")]
+    ordered = unranked + ranked
+    await storage.tasks.set_positions(
+        user_id, {t["id"]: rank for t, rank in zip(ordered, spread_ranks(len(ordered)))}
+    )
+
+async def run_rebalancer():
+    while True:
+        await asyncio.sleep(RANK_REBALANCE_INTERVAL_SECONDS)
+        while pending_rebalances:
+            user_id = pending_rebalances.pop()
+            try:
+                await rebalance_positions(user_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f"Rank rebalance failed for user {user_id}")
+
+# Category helpers
+category_jobs: set = set()
+
+def _completed(task: Optional[dict]) -> int:
+    return 1 if task and task["status"] == TaskStatus.COMPLETED else 0
+
+async def adjust_category_counts(
+    categories: CategoryRepo, user_id: str, old_task: Optional[dict], new_task: Optional[dict]
+):
+    """Update category counters for a task going from old_task to new_task (None = absent)."""
+    old_category = old_task.get("category_id") if old_task else None
+    new_category = new_task.get("category_id") if new_task else None
+    if old_category and old_category == new_category:
+        completed_delta = _completed(new_task) - _completed(old_task)
+        if completed_delta:
+            await categories.increment_counts(user_id, old_category, 0, completed_delta)
+        return
+    if old_category:
+        await categories.increment_counts(user_id, old_category, -1, -_completed(old_task))
+    if new_category:
+        await categories.increment_counts(user_id, new_category, 1, _completed(new_task))
+
+async def ensure_category_counts(
+    user_id: str, user_categories: List[dict], categories: CategoryRepo, tasks: TaskRepo
+):
+    """Backfill counters on categories created before they were maintained."""
+    for cat in user_categories:
+        if "task_count" not in cat:
+            total, completed = await tasks.count_by_category(user_id, cat["id"])
+            await categories.set_counts(user_id, cat["id"], total, completed)
+            cat["task_count"], cat["completed_count"] = total, completed
+
+async def backfill_category_counts():
+    """Give every category created before counts were kept its exact counts."""
+    for cat in await storage.categories.list_missing_counts():
+        total, completed = await storage.tasks.count_by_category(cat["user_id"], cat["id"])
+        await storage.categories.set_counts(cat["user_id"], cat["id"], total, completed)
+
+async def require_live_category(categories: CategoryRepo, user_id: str, category_id: Optional[str]):
+    if category_id and not await categories.get(user_id, category_id):
+        raise HTTPException(status_code=400, detail="Category not found")
+
+async def cascade_category_deletion(category: dict):
+    """Reassign or clear category_id on a deleted category's tasks, then drop the category."""
+    user_id, category_id, target_id = category["user_id"], category["id"], category.get("reassign_to")
+    while True:
+        moved, completed = await storage.tasks.reassign_category_batch(
+            user_id, category_id, target_id, CATEGORY_CLEANUP_BATCH_SIZE
+        )
+        if not moved:
+            break
+        if target_id:
+            await storage.categories.increment_counts(user_id, target_id, moved, completed)
+        await asyncio.sleep(CATEGORY_CLEANUP_PAUSE_SECONDS)
+    await storage.categories.delete(user_id, category_id)
+
+def start_category_deletion(category: dict):
+    # A fresh context keeps the job out of the request's profiling capture
+    job = asyncio.create_task(cascade_category_deletion(category), context=contextvars.Context())
+    category_jobs.add(job)
+    job.add_done_callback(category_jobs.discard)
+
+# Archive helpers
+async def archive_completed_tasks(
+    older_than_days: int = ARCHIVE_AFTER_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    max_batches: int = ARCHIVE_MAX_BATCHES_PER_RUN,
+    pause_seconds: float = ARCHIVE_BATCH_PAUSE_SECONDS,
+) -> int:
+    """Move old completed tasks into the archive tier in rate-limited batches.
+
+    Returns the number of tasks moved.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    moved = 0
+    for _ in range(max_batches):
+        batch_moved = await storage.tasks.archive_batch(cutoff, batch_size)
+        moved += batch_moved
+        if batch_moved < batch_size:
+            break
+        await asyncio.sleep(pause_seconds)
+    return moved
+
+async def run_archiver():
+    while True:
+        try:
+            moved = await archive_completed_tasks()
+            if moved:
+                logger.info(f"Archived {moved} completed tasks")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Task archiver run failed")
+        await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+
 # Authentication Routes
 @api_router.post("/auth/register", response_model=Token)
-async def register(user_data: UserCreate):
+async def register(user_data: UserCreate, users: UserRepo = Depends(get_user_repo)):
     # Check if user exists
-    existing_user = await db.users.find_one({"email": user_data.email})
+    existing_user = await users.find_by_email(user_data.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
@@ -188,7 +455,7 @@ async def register(user_data: UserCreate):
         password_hash=hashed_password
     )
     
-    await db.users.insert_one(user.dict())
+    await users.insert(user.dict())
     
     # Create access token
     access_token = create_access_token(data={"sub": user.id})
@@ -200,8 +467,8 @@ async def register(user_data: UserCreate):
     )
 
 @api_router.post("/auth/login", response_model=Token)
-async def login(login_data: UserLogin):
-    user = await db.users.find_one({"email": login_data.email})
+async def login(login_data: UserLogin, users: UserRepo = Depends(get_user_repo)):
+    user = await users.find_by_email(login_data.email)
     if not user or not verify_password(login_data.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
@@ -219,28 +486,69 @@ async def get_me(current_user: User = Depends(get_current_user)):
 
 # Category Routes
 @api_router.post("/categories", response_model=Category)
-async def create_category(category_data: CategoryCreate, current_user: User = Depends(get_current_user)):
+async def create_category(
+    category_data: CategoryCreate,
+    current_user: User = Depends(get_current_user),
+    categories: CategoryRepo = Depends(get_category_repo)
+):
     category = Category(user_id=current_user.id, **category_data.dict())
-    await db.categories.insert_one(category.dict())
+    await categories.insert(category.dict())
     return category
 
-@api_router.get("/categories", response_model=List[Category])
-async def get_categories(current_user: User = Depends(get_current_user)):
-    categories = await db.categories.find({"user_id": current_user.id}).to_list(1000)
-    return [Category(**cat) for cat in categories]
+@api_router.get("/categories", response_model=List[CategoryResponse], response_model_exclude_none=True)
+async def get_categories(
+    with_counts: bool = False,
+    current_user: User = Depends(get_current_user),
+    categories: CategoryRepo = Depends(get_category_repo),
+    tasks: TaskRepo = Depends(get_task_repo)
+):
+    user_categories = await categories.list(current_user.id)
+    # Counts are read from the category documents, never from the tasks collection
+    exclude = None
+    if with_counts:
+        await ensure_category_counts(current_user.id, user_categories, categories, tasks)
+    else:
+        exclude = {"task_count", "completed_count"}
+    return [CategoryResponse(**Category(**cat).dict(exclude=exclude)) for cat in user_categories]
 
 @api_router.delete("/categories/{category_id}")
-async def delete_category(category_id: str, current_user: User = Depends(get_current_user)):
-    result = await db.categories.delete_one({"id": category_id, "user_id": current_user.id})
-    if result.deleted_count == 0:
+async def delete_category(
+    category_id: str,
+    reassign_to: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    categories: CategoryRepo = Depends(get_category_repo)
+):
+    if reassign_to and (
+        reassign_to == category_id or not await categories.get(current_user.id, reassign_to)
+    ):
+        raise HTTPException(status_code=400, detail="Invalid reassign_to category")
+    
+    # The category disappears immediately; its tasks are updated by a background job
+    category = await categories.mark_deleting(current_user.id, category_id, reassign_to)
+    if not category:
         raise HTTPException(status_code=404, detail="Category not found")
+    start_category_deletion(category)
     return {"message": "Category deleted"}
 
 # Task Routes
 @api_router.post("/tasks", response_model=Task)
-async def create_task(task_data: TaskCreate, current_user: User = Depends(get_current_user)):
-    task = Task(user_id=current_user.id, **task_data.dict())
-    await db.tasks.insert_one(task.dict())
+async def create_task(
+    task_data: TaskCreate,
+    current_user: User = Depends(get_current_user),
+    tasks: TaskRepo = Depends(get_task_repo),
+    categories: CategoryRepo = Depends(get_category_repo),
+    notifications: NotificationRepo = Depends(get_notification_repo)
+):
+    await require_live_category(categories, current_user.id, task_data.category_id)
+    
+    # New tasks go to the top of the manual order
+    first_position = await tasks.first_position(current_user.id)
+    position = rank_between(None, first_position)
+    if len(position) > RANK_MAX_LENGTH:
+        pending_rebalances.add(current_user.id)
+    task = Task(user_id=current_user.id, position=position, **task_data.dict())
+    await tasks.insert(task.dict())
+    await adjust_category_counts(categories, current_user.id, None, task.dict())
     
     # Create notification for new task
     if task.due_date:
@@ -251,7 +559,7 @@ async def create_task(task_data: TaskCreate, current_user: User = Depends(get_cu
             message=f"Task '{task.title}' is due on {task.due_date.strftime('%Y-%m-%d')}",
             task_id=task.id
         )
-        await db.notifications.insert_one(notification.dict())
+        await notifications.insert(notification.dict())
     
     return task
 
@@ -260,22 +568,85 @@ async def get_tasks(
     status: Optional[TaskStatus] = None,
     priority: Optional[TaskPriority] = None,
     category_id: Optional[str] = None,
-    current_user: User = Depends(get_current_user)
+    include_archived: bool = False,
+    sort: TaskSort = TaskSort.CREATED_AT,
+    current_user: User = Depends(get_current_user),
+    tasks: TaskRepo = Depends(get_task_repo)
 ):
-    query = {"user_id": current_user.id}
+    filters = {}
     if status:
-        query["status"] = status
+        filters["status"] = status
     if priority:
-        query["priority"] = priority
+        filters["priority"] = priority
     if category_id:
-        query["category_id"] = category_id
+        filters["category_id"] = category_id
     
-    tasks = await db.tasks.find(query).sort("created_at", -1).to_list(1000)
-    return [Task(**task) for task in tasks]
+    user_tasks = await tasks.list(
+        current_user.id, filters, include_archived=include_archived, sort=sort
+    )
+    if sort == TaskSort.POSITION and any(not t.get("position") for t in user_tasks):
+        pending_rebalances.add(current_user.id)
+    return [Task(**task) for task in user_tasks]
+
+@api_router.put("/tasks/{task_id}/position", response_model=Task)
+async def move_task(
+    task_id: str,
+    move: TaskMove,
+    current_user: User = Depends(get_current_user),
+    tasks: TaskRepo = Depends(get_task_repo)
+):
+    if not move.prev_id and not move.next_id:
+        raise HTTPException(status_code=400, detail="prev_id or next_id is required")
+    
+    task = await tasks.get(current_user.id, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    neighbours = []
+    for neighbour_id in (move.prev_id, move.next_id):
+        neighbour = await tasks.get(current_user.id, neighbour_id) if neighbour_id else None
+        if neighbour_id and not neighbour:
+            raise HTTPException(status_code=404, detail="Neighbouring task not found")
+        neighbours.append(neighbour)
+    prev_task, next_task = neighbours
+    
+    if any(n is not None and not n.get("position") for n in neighbours):
+        # Tasks created before manual ordering have no key yet
+        await rebalance_positions(current_user.id)
+        prev_task = await tasks.get(current_user.id, move.prev_id) if move.prev_id else None
+        next_task = await tasks.get(current_user.id, move.next_id) if move.next_id else None
+    
+    try:
+        position = rank_between(
+            prev_task["position"] if prev_task else None,
+            next_task["position"] if next_task else None
+        )
+    except ValueError:
+        pending_rebalances.add(current_user.id)
+        raise HTTPException(status_code=409, detail="Task order changed, reload and retry")
+    
+    if len(position) > RANK_MAX_LENGTH:
+        pending_rebalances.add(current_user.id)
+    result = await tasks.update(task_id, {"position": position, "updated_at": datetime.utcnow()})
+    if not result:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return Task(**result[1])
 
 @api_router.put("/tasks/{task_id}", response_model=Task)
-async def update_task(task_id: str, task_update: TaskUpdate, current_user: User = Depends(get_current_user)):
-    task = await db.tasks.find_one({"id": task_id, "user_id": current_user.id})
+async def update_task(
+    task_id: str,
+    task_update: TaskUpdate,
+    current_user: User = Depends(get_current_user),
+    tasks: TaskRepo = Depends(get_task_repo),
+    categories: CategoryRepo = Depends(get_category_repo),
+    notifications: NotificationRepo = Depends(get_notification_repo)
+):
+    await require_live_category(categories, current_user.id, task_update.category_id)
+    
+    task = await tasks.get(current_user.id, task_id)
+    if not task:
+        # Editing an archived task brings it back into the working set
+        task = await tasks.restore_archived(current_user.id, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
@@ -294,25 +665,39 @@ async def update_task(task_id: str, task_update: TaskUpdate, current_user: User
             message=f"Great job completing '{task['title']}'!",
             task_id=task_id
         )
-        await db.notifications.insert_one(notification.dict())
+        await notifications.insert(notification.dict())
     
-    await db.tasks.update_one({"id": task_id}, {"$set": update_data})
-    updated_task = await db.tasks.find_one({"id": task_id})
+    result = await tasks.update(task_id, update_data)
+    if not result:
+        raise HTTPException(status_code=404, detail="Task not found")
+    # Count from the write's own pre-image: the task may have changed since it was read
+    old_task, updated_task = result
+    await adjust_category_counts(categories, current_user.id, old_task, updated_task)
     return Task(**updated_task)
 
 @api_router.delete("/tasks/{task_id}")
-async def delete_task(task_id: str, current_user: User = Depends(get_current_user)):
-    result = await db.tasks.delete_one({"id": task_id, "user_id": current_user.id})
-    if result.deleted_count == 0:
+async def delete_task(
+    task_id: str,
+    current_user: User = Depends(get_current_user),
+    tasks: TaskRepo = Depends(get_task_repo),
+    categories: CategoryRepo = Depends(get_category_repo)
+):
+    task = await tasks.delete(current_user.id, task_id)
+    if not task:
         raise HTTPException(status_code=404, detail="Task not found")
+    await adjust_category_counts(categories, current_user.id, task, None)
     return {"message": "Task deleted"}
 
 # Analytics Routes
 @api_router.get("/analytics", response_model=AnalyticsResponse)
-async def get_analytics(current_user: User = Depends(get_current_user)):
-    # Get all user tasks
-    tasks = await db.tasks.find({"user_id": current_user.id}).to_list(1000)
-    categories = await db.categories.find({"user_id": current_user.id}).to_list(1000)
+async def get_analytics(
+    current_user: User = Depends(get_current_user),
+    task_repo: TaskRepo = Depends(get_task_repo),
+    category_repo: CategoryRepo = Depends(get_category_repo)
+):
+    # Get all user tasks, including archived ones
+    tasks = await task_repo.list(current_user.id, include_archived=True)
+    categories = await category_repo.list(current_user.id)
     
     total_tasks = len(tasks)
     completed_tasks = len([t for t in tasks if t["status"] == TaskStatus.COMPLETED])
@@ -339,15 +724,15 @@ async def get_analytics(current_user: User = Depends(get_current_user)):
             "completed": completed_count
         })
     
-    # Category stats
+    # Category stats, from the counters kept on each category
+    await ensure_category_counts(current_user.id, categories, category_repo, task_repo)
     category_stats = []
     for cat in categories:
-        cat_tasks = [t for t in tasks if t.get("category_id") == cat["id"]]
         category_stats.append({
             "name": cat["name"],
             "color": cat["color"],
-            "total": len(cat_tasks),
-            "completed": len([t for t in cat_tasks if t["status"] == TaskStatus.COMPLETED])
+            "total": cat["task_count"],
+            "completed": cat["completed_count"]
         })
     
     # Priority distribution
@@ -372,30 +757,56 @@ async def get_analytics(current_user: User = Depends(get_current_user)):
 
 # Notification Routes
 @api_router.get("/notifications", response_model=List[Notification])
-async def get_notifications(current_user: User = Depends(get_current_user)):
-    notifications = await db.notifications.find(
-        {"user_id": current_user.id}
-    ).sort("created_at", -1).limit(50).to_list(50)
-    return [Notification(**notif) for notif in notifications]
+async def get_notifications(
+    current_user: User = Depends(get_current_user),
+    notifications: NotificationRepo = Depends(get_notification_repo)
+):
+    user_notifications = await notifications.list_recent(current_user.id, limit=50)
+    return [Notification(**notif) for notif in user_notifications]
 
 @api_router.put("/notifications/{notification_id}/read")
-async def mark_notification_read(notification_id: str, current_user: User = Depends(get_current_user)):
-    await db.notifications.update_one(
-        {"id": notification_id, "user_id": current_user.id},
-        {"$set": {"read": True}}
-    )
+async def mark_notification_read(
+    notification_id: str,
+    current_user: User = Depends(get_current_user),
+    notifications: NotificationRepo = Depends(get_notification_repo)
+):
+    await notifications.mark_read(current_user.id, notification_id)
     return {"message": "Notification marked as read"}
 
 @api_router.delete("/notifications/{notification_id}")
-async def delete_notification(notification_id: str, current_user: User = Depends(get_current_user)):
-    result = await db.notifications.delete_one({"id": notification_id, "user_id": current_user.id})
-    if result.deleted_count == 0:
+async def delete_notification(
+    notification_id: str,
+    current_user: User = Depends(get_current_user),
+    notifications: NotificationRepo = Depends(get_notification_repo)
+):
+    if not await notifications.delete(current_user.id, notification_id):
         raise HTTPException(status_code=404, detail="Notification not found")
     return {"message": "Notification deleted"}
 
+# Admin Routes
+@api_router.get("/admin/profiles", dependencies=[Depends(verify_admin)])
+async def get_profiles():
+    return [capture.summary() for capture in reversed(profiler.captures)]
+
+@api_router.get(
+    "/admin/profiles/{capture_id}/flamegraph",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(verify_admin)]
+)
+async def get_profile_flamegraph(capture_id: str):
+    capture = profiler.get(capture_id)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(
+        capture.collapsed_stacks(),
+        headers={"Content-Disposition": f'attachment; filename="{capture_id}.folded"'}
+    )
+
 # Include router and add CORS
 app.include_router(api_router)
 
+app.middleware("http")(profiler)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -411,6 +822,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+background_tasks: List[asyncio.Task] = []
+
+@app.on_event("startup")
+async def startup_storage():
+    await storage.ensure_indexes()
+    await backfill_category_counts()
+    # Resume category deletions interrupted by a restart
+    for category in await storage.categories.list_deleting():
+        start_category_deletion(category)
+    background_tasks.append(asyncio.create_task(run_archiver()))
+    background_tasks.append(asyncio.create_task(run_rebalancer()))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    for task in background_tasks:
+        task.cancel()
+    storage.close()
\ No newline at end of file
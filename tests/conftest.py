@@ -0,0 +1,40 @@
+import os
+import sys
+from pathlib import Path
+
+import bcrypt
+import pytest
+from fastapi.testclient import TestClient
+
+# Tests run against the embedded in-memory backend, no MongoDB needed
+os.environ["STORAGE_BACKEND"] = "memory"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from repositories import create_memory_storage  # noqa: E402
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    fresh_storage = create_memory_storage()
+    monkeypatch.setattr(server, "storage", fresh_storage)
+    return fresh_storage
+
+
+@pytest.fixture
+def client(storage, monkeypatch):
+    # Cheap password hashing keeps registration fast
+    gensalt = bcrypt.gensalt
+    monkeypatch.setattr(bcrypt, "gensalt", lambda: gensalt(rounds=4))
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth_headers(client):
+    response = client.post(
+        "/api/auth/register",
+        json={"email": "sarah.johnson@example.com", "name": "Sarah Johnson", "password": "SecurePass123!"}
+    )
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
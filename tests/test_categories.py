@@ -0,0 +1,157 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+@pytest.fixture(autouse=True)
+def small_cleanup_batches(monkeypatch):
+    monkeypatch.setattr(server, "CATEGORY_CLEANUP_BATCH_SIZE", 2)
+    monkeypatch.setattr(server, "CATEGORY_CLEANUP_PAUSE_SECONDS", 0)
+
+
+def create_category(client, headers, name):
+    return client.post("/api/categories", json={"name": name}, headers=headers).json()["id"]
+
+
+def create_task(client, headers, **fields):
+    response = client.post("/api/tasks", json={"title": "Task", **fields}, headers=headers)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def counts(client, headers):
+    categories = client.get("/api/categories?with_counts=true", headers=headers).json()
+    return {c["id"]: (c["task_count"], c["completed_count"]) for c in categories}
+
+
+def wait_until_deleted(storage, category_id):
+    for _ in range(100):
+        if storage.categories.categories.get(category_id) is None:
+            return
+        time.sleep(0.01)
+    raise AssertionError("category deletion did not finish")
+
+
+def test_categories_hide_counts_unless_requested(client, auth_headers):
+    create_category(client, auth_headers, "Work")
+    [category] = client.get("/api/categories", headers=auth_headers).json()
+    assert "task_count" not in category
+
+
+def test_counts_follow_task_create_update_and_delete(client, auth_headers):
+    work = create_category(client, auth_headers, "Work")
+    home = create_category(client, auth_headers, "Home")
+    first = create_task(client, auth_headers, category_id=work)
+    second = create_task(client, auth_headers, category_id=work)
+    assert counts(client, auth_headers) == {work: (2, 0), home: (0, 0)}
+
+    client.put(f"/api/tasks/{first}", json={"status": "completed"}, headers=auth_headers)
+    assert counts(client, auth_headers) == {work: (2, 1), home: (0, 0)}
+
+    client.put(f"/api/tasks/{first}", json={"category_id": home}, headers=auth_headers)
+    assert counts(client, auth_headers) == {work: (1, 0), home: (1, 1)}
+
+    client.delete(f"/api/tasks/{second}", headers=auth_headers)
+    client.delete(f"/api/tasks/{first}", headers=auth_headers)
+    assert counts(client, auth_headers) == {work: (0, 0), home: (0, 0)}
+
+    analytics = client.get("/api/analytics", headers=auth_headers).json()
+    assert [(c["name"], c["total"]) for c in analytics["category_stats"]] == [("Work", 0), ("Home", 0)]
+
+
+def test_update_counts_from_the_task_it_overwrote(client, auth_headers, storage, monkeypatch):
+    work = create_category(client, auth_headers, "Work")
+    home = create_category(client, auth_headers, "Home")
+    other = create_category(client, auth_headers, "Other")
+    task = create_task(client, auth_headers, category_id=work)
+    update = storage.tasks.update
+
+    async def update_after_concurrent_move(task_id, fields):
+        # Another request moves the task between this request's read and its write
+        monkeypatch.setattr(storage.tasks, "update", update)
+        old_task, new_task = await update(task_id, {"category_id": other})
+        await server.adjust_category_counts(storage.categories, old_task["user_id"], old_task, new_task)
+        return await update(task_id, fields)
+
+    monkeypatch.setattr(storage.tasks, "update", update_after_concurrent_move)
+    client.put(f"/api/tasks/{task}", json={"category_id": home}, headers=auth_headers)
+    assert counts(client, auth_headers) == {work: (0, 0), home: (1, 0), other: (0, 0)}
+
+
+def test_tasks_reject_unknown_or_deleting_categories(client, auth_headers, storage):
+    assert client.post(
+        "/api/tasks", json={"title": "Task", "category_id": "missing"}, headers=auth_headers
+    ).status_code == 400
+
+    task = create_task(client, auth_headers)
+    work = create_category(client, auth_headers, "Work")
+    storage.categories.categories.update(work, {"deleting": True})
+    assert client.post(
+        "/api/tasks", json={"title": "Task", "category_id": work}, headers=auth_headers
+    ).status_code == 400
+    assert client.put(
+        f"/api/tasks/{task}", json={"category_id": work}, headers=auth_headers
+    ).status_code == 400
+
+
+def test_delete_category_clears_tasks_in_batches(client, auth_headers, storage):
+    work = create_category(client, auth_headers, "Work")
+    task_ids = [create_task(client, auth_headers, category_id=work) for _ in range(5)]
+
+    assert client.delete(f"/api/categories/{work}", headers=auth_headers).status_code == 200
+    assert client.get("/api/categories", headers=auth_headers).json() == []
+    wait_until_deleted(storage, work)
+
+    tasks = client.get("/api/tasks", headers=auth_headers).json()
+    assert sorted(t["id"] for t in tasks) == sorted(task_ids)
+    assert {t["category_id"] for t in tasks} == {None}
+    assert client.delete(f"/api/categories/{work}", headers=auth_headers).status_code == 404
+
+
+def test_delete_category_reassigns_tasks_and_counts(client, auth_headers, storage):
+    work = create_category(client, auth_headers, "Work")
+    home = create_category(client, auth_headers, "Home")
+    task_ids = [create_task(client, auth_headers, category_id=work) for _ in range(3)]
+    create_task(client, auth_headers, category_id=home)
+    client.put(f"/api/tasks/{task_ids[0]}", json={"status": "completed"}, headers=auth_headers)
+
+    assert client.delete(
+        f"/api/categories/{work}?reassign_to={work}", headers=auth_headers
+    ).status_code == 400
+    assert client.delete(
+        f"/api/categories/{work}?reassign_to={home}", headers=auth_headers
+    ).status_code == 200
+    wait_until_deleted(storage, work)
+
+    tasks = client.get("/api/tasks", headers=auth_headers).json()
+    assert {t["category_id"] for t in tasks} == {home}
+    assert counts(client, auth_headers) == {home: (4, 1)}
+
+
+def test_startup_backfills_counts_for_legacy_categories(storage):
+    user = server.User(email="legacy@example.com", name="Legacy", password_hash="x")
+    category = server.Category(user_id=user.id, name="Legacy").dict(
+        exclude={"task_count", "completed_count"}
+    )
+    asyncio.run(storage.users.insert(user.dict()))
+    asyncio.run(storage.categories.insert(category))
+    for status in ("todo", "completed"):
+        task = server.Task(user_id=user.id, title="Old", status=status, category_id=category["id"])
+        asyncio.run(storage.tasks.insert(task.dict()))
+
+    headers = {"Authorization": f"Bearer {server.create_access_token({'sub': user.id})}"}
+    with TestClient(server.app) as client:
+        # A write before the first read must not hide the tasks that already existed
+        create_task(client, headers, category_id=category["id"])
+        assert counts(client, headers) == {category["id"]: (3, 1)}
+
+
+def test_increment_skips_categories_without_counts(storage):
+    category = server.Category(user_id="u1", name="Legacy").dict(exclude={"task_count", "completed_count"})
+    asyncio.run(storage.categories.insert(category))
+    asyncio.run(storage.categories.increment_counts("u1", category["id"], 1, 0))
+    assert "task_count" not in storage.categories.categories.get(category["id"])
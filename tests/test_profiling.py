@@ -0,0 +1,98 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+import server
+from profiling import MongoCommandRecorder, RequestCapture, _current_capture
+
+ADMIN_TOKEN = "test-admin-token"
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    monkeypatch.setattr(server.profiler, "admin_token", ADMIN_TOKEN)
+    server.profiler.captures.clear()
+    yield server.profiler
+    server.profiler.captures.clear()
+
+
+def wait_for_captures(profiler, count):
+    for _ in range(100):
+        if len(profiler.captures) >= count:
+            return
+        time.sleep(0.01)
+
+
+def command_events(request_id, command):
+    started = SimpleNamespace(
+        command_name="update", database_name="test_database", request_id=request_id, command=command
+    )
+    succeeded = SimpleNamespace(request_id=request_id, duration_micros=1500)
+    return started, succeeded
+
+
+def test_profile_header_requires_admin_token(client, auth_headers, profiler):
+    client.get("/api/tasks", headers={**auth_headers, "X-Profile": "1"})
+    time.sleep(0.05)
+    assert len(profiler.captures) == 0
+
+    client.get("/api/tasks", headers={**auth_headers, "X-Profile": "1", "X-Admin-Token": ADMIN_TOKEN})
+    wait_for_captures(profiler, 1)
+    assert [c.path for c in profiler.captures] == ["/api/tasks"]
+
+
+def test_admin_routes_list_and_download_captures(client, auth_headers, profiler):
+    admin = {"X-Admin-Token": ADMIN_TOKEN}
+    client.get("/api/tasks", headers={**auth_headers, "X-Profile": "1", **admin})
+    wait_for_captures(profiler, 1)
+
+    assert client.get("/api/admin/profiles").status_code == 403
+    captures = client.get("/api/admin/profiles", headers=admin).json()
+    assert captures[0]["profiled"] is True
+    flamegraph = client.get(f"/api/admin/profiles/{captures[0]['id']}/flamegraph", headers=admin)
+    assert flamegraph.status_code == 200
+
+
+def test_recorder_stores_json_bodies():
+    recorder = MongoCommandRecorder()
+    capture = RequestCapture("GET", "/api/tasks", profiled=True)
+    object_id = ObjectId()
+    started, succeeded = command_events(1, {
+        "update": "tasks",
+        "updates": [{"q": {"_id": {"$in": [object_id]}}}],
+        "lsid": {"id": "session"},
+        "$db": "test_database",
+    })
+
+    token = _current_capture.set(capture)
+    try:
+        recorder.started(started)
+        recorder.succeeded(succeeded)
+    finally:
+        _current_capture.reset(token)
+
+    [record] = capture.mongo_commands
+    assert record["collection"] == "tasks"
+    assert record["duration_ms"] == 1.5
+    assert record["body"] == {
+        "update": "tasks",
+        "updates": [{"q": {"_id": {"$in": [{"$oid": str(object_id)}]}}}],
+    }
+
+
+def test_recorder_ignores_commands_after_the_request_finished():
+    recorder = MongoCommandRecorder()
+    capture = RequestCapture("DELETE", "/api/categories/x", profiled=False)
+    capture.finished = True
+    started, succeeded = command_events(2, {"update": "tasks", "updates": []})
+
+    token = _current_capture.set(capture)
+    try:
+        recorder.started(started)
+        recorder.succeeded(succeeded)
+    finally:
+        _current_capture.reset(token)
+
+    assert capture.mongo_commands == []
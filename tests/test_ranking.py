@@ -0,0 +1,101 @@
+import random
+
+import pytest
+
+import server
+from server import RANK_DIGITS, rank_between, spread_ranks
+
+
+def assert_between(lower, upper):
+    rank = rank_between(lower, upper)
+    assert lower is None or lower < rank
+    assert upper is None or rank < upper
+    assert not rank.endswith(RANK_DIGITS[0])
+    return rank
+
+
+def test_rank_between_open_ends():
+    first = assert_between(None, None)
+    assert assert_between(None, first) < first
+    assert assert_between(first, None) > first
+
+
+@pytest.mark.parametrize("lower, upper", [
+    ("0", "1"),
+    ("", "1"),
+    (None, "1"),
+    ("z", None),
+    ("V", "W"),
+    ("a", "a01"),
+    ("Vz", "W"),
+    ("V", "V1"),
+])
+def test_rank_between_adjacent_keys(lower, upper):
+    assert_between(lower, upper)
+
+
+@pytest.mark.parametrize("lower, upper", [("V", "V"), ("W", "V"), ("a1", "a")])
+def test_rank_between_rejects_unordered_bounds(lower, upper):
+    with pytest.raises(ValueError):
+        rank_between(lower, upper)
+
+
+def test_rank_between_random_inserts_keep_order():
+    rng = random.Random(7)
+    ranks = [assert_between(None, None)]
+    for _ in range(2000):
+        i = rng.randint(0, len(ranks))
+        lower = ranks[i - 1] if i > 0 else None
+        upper = ranks[i] if i < len(ranks) else None
+        ranks.insert(i, assert_between(lower, upper))
+    assert ranks == sorted(ranks)
+    assert len(set(ranks)) == len(ranks)
+
+
+def test_repeated_prepends_grow_keys_one_digit_per_61_inserts():
+    rank = assert_between(None, None)
+    for n in range(1, 500):
+        rank = assert_between(None, rank)
+        assert len(rank) <= 2 + n // (len(RANK_DIGITS) - 1)
+    assert len(rank) == 9
+
+
+@pytest.mark.parametrize("count", [0, 1, 2, 61, 62, 1000, 5000])
+def test_spread_ranks_are_sorted_unique_and_short(count):
+    ranks = spread_ranks(count)
+    assert len(ranks) == count
+    assert ranks == sorted(ranks)
+    assert len(set(ranks)) == count
+    assert all(rank and not rank.endswith(RANK_DIGITS[0]) for rank in ranks)
+    assert all(len(rank) <= 3 for rank in ranks)
+
+
+def test_creating_tasks_queues_a_rebalance_when_keys_grow(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(server, "RANK_MAX_LENGTH", 1)
+    server.pending_rebalances.clear()
+    user_id = client.get("/api/auth/me", headers=auth_headers).json()["id"]
+    # Prepends step down from the middle digit and only outgrow one digit after "1"
+    for i in range(RANK_DIGITS.index("V")):
+        client.post("/api/tasks", json={"title": f"Task {i}"}, headers=auth_headers)
+    assert user_id not in server.pending_rebalances
+
+    client.post("/api/tasks", json={"title": "One more"}, headers=auth_headers)
+    assert user_id in server.pending_rebalances
+    server.pending_rebalances.clear()
+
+
+def test_move_and_sort_by_position(client, auth_headers):
+    a, b, c = [
+        client.post("/api/tasks", json={"title": title}, headers=auth_headers).json()["id"]
+        for title in "abc"
+    ]
+
+    def titles():
+        return [t["title"] for t in client.get("/api/tasks?sort=position", headers=auth_headers).json()]
+
+    assert titles() == ["c", "b", "a"]
+    client.put(f"/api/tasks/{a}/position", json={"next_id": c}, headers=auth_headers)
+    assert titles() == ["a", "c", "b"]
+    client.put(f"/api/tasks/{c}/position", json={"prev_id": b}, headers=auth_headers)
+    assert titles() == ["a", "b", "c"]
+    assert client.put(f"/api/tasks/{c}/position", json={}, headers=auth_headers).status_code == 400
@@ -0,0 +1,298 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from mongomock_motor import AsyncMongoMockClient
+
+from repositories import MemoryTaskRepo, MongoTaskRepo
+
+NOW = datetime(2026, 1, 1)
+
+
+def make_task(task_id, minutes, user_id="u1", **fields):
+    task = {
+        "id": task_id,
+        "user_id": user_id,
+        "title": task_id,
+        "status": "todo",
+        "priority": "medium",
+        "category_id": None,
+        "position": None,
+        "completed_at": None,
+        "created_at": NOW + timedelta(minutes=minutes),
+        "updated_at": NOW + timedelta(minutes=minutes),
+    }
+    task.update(fields)
+    return task
+
+
+def make_repo(*tasks):
+    repo = MemoryTaskRepo()
+    for task in tasks:
+        asyncio.run(repo.insert(task))
+    return repo
+
+
+def ids(tasks):
+    return [t["id"] for t in tasks]
+
+
+# Repository semantics, matching the MongoDB queries of MongoTaskRepo
+def test_list_orders_by_created_at_newest_first():
+    repo = make_repo(make_task("a", 1), make_task("c", 3), make_task("b", 2))
+    assert ids(asyncio.run(repo.list("u1"))) == ["c", "b", "a"]
+
+
+def test_list_by_position_puts_missing_positions_first():
+    repo = make_repo(
+        make_task("a", 1, position="V"),
+        make_task("b", 2),
+        make_task("c", 3, position="F"),
+        make_task("d", 4, position="k"),
+    )
+    tasks = asyncio.run(repo.list("u1", sort="position"))
+    assert ids(tasks) == ["b", "c", "a", "d"]
+
+
+def test_list_filters_intersect_and_accept_enum_values():
+    from server import TaskPriority, TaskStatus
+
+    repo = make_repo(
+        make_task("a", 1, status="todo", priority="high"),
+        make_task("b", 2, status="todo", priority="low"),
+        make_task("c", 3, status="completed", priority="high"),
+    )
+    tasks = asyncio.run(repo.list("u1", {"status": TaskStatus.TODO, "priority": TaskPriority.HIGH}))
+    assert ids(tasks) == ["a"]
+    assert ids(asyncio.run(repo.list("u1", {"category_id": "missing"}))) == []
+
+
+def test_list_is_scoped_per_user_and_limited():
+    repo = make_repo(make_task("a", 1), make_task("b", 2), make_task("x", 3, user_id="u2"))
+    assert ids(asyncio.run(repo.list("u1", limit=1))) == ["b"]
+    assert ids(asyncio.run(repo.list("u2"))) == ["x"]
+
+
+def test_selective_filters_sort_only_the_users_matches():
+    repo = make_repo(
+        *[make_task(f"t{i}", i, position=f"{i:02d}1") for i in range(40)],
+        make_task("w1", 41, category_id="work", position="501"),
+        make_task("w2", 42, category_id="work", position="001"),
+        make_task("x", 43, user_id="u2", category_id="work"),
+    )
+    assert ids(asyncio.run(repo.list("u1", {"category_id": "work"}))) == ["w2", "w1"]
+    assert ids(asyncio.run(repo.list("u1", {"category_id": "work"}, sort="position"))) == ["w2", "w1"]
+    assert ids(asyncio.run(repo.list("u1", {"category_id": "work"}, limit=1))) == ["w2"]
+    assert ids(asyncio.run(repo.list("u2", {"category_id": "work"}))) == ["x"]
+    assert asyncio.run(repo.count_by_category("u1", "work")) == (2, 0)
+
+
+def test_update_reindexes_filters_and_order():
+    repo = make_repo(make_task("a", 1, position="F"), make_task("b", 2, position="V"))
+    asyncio.run(repo.update("b", {"status": "in_progress", "position": "7"}))
+    assert ids(asyncio.run(repo.list("u1", {"status": "in_progress"}))) == ["b"]
+    assert ids(asyncio.run(repo.list("u1", {"status": "todo"}))) == ["a"]
+    assert ids(asyncio.run(repo.list("u1", sort="position"))) == ["b", "a"]
+
+
+def test_returned_documents_are_copies():
+    repo = make_repo(make_task("a", 1))
+    task = asyncio.run(repo.get("u1", "a"))
+    task["title"] = "changed"
+    assert asyncio.run(repo.get("u1", "a"))["title"] == "a"
+
+
+def test_archive_batch_moves_only_old_untouched_completed_tasks():
+    old = NOW - timedelta(days=60)
+    repo = make_repo(
+        make_task("old", 1, status="completed", completed_at=old, updated_at=old),
+        make_task("edited", 2, status="completed", completed_at=old, updated_at=NOW),
+        make_task("open", 3),
+    )
+    assert asyncio.run(repo.archive_batch(NOW - timedelta(days=30), batch_size=10)) == 1
+    assert ids(asyncio.run(repo.list("u1"))) == ["open", "edited"]
+
+
+def test_include_archived_merges_both_tiers_in_order():
+    old = NOW - timedelta(days=60)
+    repo = make_repo(
+        make_task("a", 1, status="completed", completed_at=old, updated_at=old, position="k"),
+        make_task("b", 2, position="F"),
+        make_task("c", 3, status="completed", completed_at=old, updated_at=old, position="V"),
+    )
+    asyncio.run(repo.archive_batch(NOW - timedelta(days=30), batch_size=10))
+
+    assert ids(asyncio.run(repo.list("u1", include_archived=True))) == ["c", "b", "a"]
+    assert ids(asyncio.run(repo.list("u1", include_archived=True, sort="position"))) == ["b", "c", "a"]
+    assert ids(asyncio.run(repo.list("u1", {"status": "completed"}, include_archived=True))) == ["c", "a"]
+
+
+class Interleaved:
+    """Wraps a Motor collection and runs concurrent writes right before the first call to method."""
+
+    def __init__(self, collection, method, writes):
+        self.collection = collection
+        self.method = method
+        self.writes = writes
+
+    def __getattr__(self, name):
+        attr = getattr(self.collection, name)
+        if name != self.method or self.writes is None:
+            return attr
+
+        async def call(*args, **kwargs):
+            writes, self.writes = self.writes, None
+            await writes(self.collection)
+            return await attr(*args, **kwargs)
+        return call
+
+
+def make_mongo_repo(*tasks):
+    async def run():
+        repo = MongoTaskRepo(AsyncMongoMockClient()["test_database"])
+        for task in tasks:
+            await repo.insert(task)
+        return repo
+    return asyncio.run(run())
+
+
+def test_mongo_archive_batch_skips_tasks_changed_mid_batch():
+    old = NOW - timedelta(days=60)
+    repo = make_mongo_repo(*[
+        make_task(task_id, 1, status="completed", completed_at=old, updated_at=old)
+        for task_id in ("moved", "deleted", "edited")
+    ])
+
+    async def concurrent_writes(tasks):
+        await tasks.delete_one({"id": "deleted"})
+        await tasks.update_one({"id": "edited"}, {"$set": {"updated_at": NOW}})
+
+    async def run():
+        hot = repo.tasks
+        repo.tasks = Interleaved(hot, "find_one_and_delete", concurrent_writes)
+        moved = await repo.archive_batch(NOW - timedelta(days=30), batch_size=10)
+        repo.tasks = hot
+        return moved, await repo.list("u1"), await repo.archive.find().to_list(None)
+
+    moved, hot, archived = asyncio.run(run())
+    assert moved == 1
+    assert ids(hot) == ["edited"]
+    assert ids(archived) == ["moved"]
+
+
+def test_mongo_update_returns_the_overwritten_and_written_task():
+    repo = make_mongo_repo(make_task("a", 1, category_id="work"))
+    before, after = asyncio.run(repo.update("a", {"category_id": "home", "status": "completed"}))
+    assert (before["category_id"], before["status"]) == ("work", "todo")
+    assert (after["category_id"], after["status"]) == ("home", "completed")
+    assert asyncio.run(repo.update("missing", {"status": "completed"})) is None
+
+
+def test_mongo_reassign_category_batch_counts_tasks_as_they_are_written():
+    repo = make_mongo_repo(
+        make_task("a", 1, category_id="work"),
+        make_task("b", 2, category_id="work"),
+        make_task("c", 3, category_id="work"),
+        make_task("d", 4, category_id="work", status="completed"),
+    )
+
+    async def concurrent_writes(tasks):
+        await tasks.update_one({"id": "a"}, {"$set": {"status": "completed"}})
+        await tasks.update_one({"id": "b"}, {"$set": {"category_id": "home"}})
+        await tasks.update_one({"id": "d"}, {"$set": {"status": "todo"}})
+
+    async def run():
+        hot = repo.tasks
+        repo.tasks = Interleaved(hot, "update_many", concurrent_writes)
+        first = await repo.reassign_category_batch("u1", "work", "inbox", batch_size=10)
+        repo.tasks = hot
+        second = await repo.reassign_category_batch("u1", "work", "inbox", batch_size=10)
+        return first, second, await repo.list("u1", {"category_id": "inbox"})
+
+    first, second, moved = asyncio.run(run())
+    assert first == (3, 1)
+    assert second == (0, 0)
+    assert sorted(ids(moved)) == ["a", "c", "d"]
+
+
+def test_restore_and_delete_reach_the_archive():
+    old = NOW - timedelta(days=60)
+    repo = make_repo(
+        make_task("a", 1, status="completed", completed_at=old, updated_at=old),
+        make_task("b", 2, status="completed", completed_at=old, updated_at=old),
+    )
+    asyncio.run(repo.archive_batch(NOW - timedelta(days=30), batch_size=10))
+
+    assert asyncio.run(repo.restore_archived("u1", "a"))["id"] == "a"
+    assert ids(asyncio.run(repo.list("u1"))) == ["a"]
+    assert asyncio.run(repo.delete("u1", "b"))["id"] == "b"
+    assert ids(asyncio.run(repo.list("u1", include_archived=True))) == ["a"]
+
+
+# Routes on the in-memory backend
+def test_auth_flow(client, auth_headers):
+    me = client.get("/api/auth/me", headers=auth_headers)
+    assert me.status_code == 200
+    assert me.json()["email"] == "sarah.johnson@example.com"
+
+    login = client.post(
+        "/api/auth/login", json={"email": "sarah.johnson@example.com", "password": "SecurePass123!"}
+    )
+    assert login.status_code == 200
+    bad_login = client.post(
+        "/api/auth/login", json={"email": "sarah.johnson@example.com", "password": "wrong"}
+    )
+    assert bad_login.status_code == 401
+
+
+def test_task_crud_and_filters(client, auth_headers):
+    first = client.post("/api/tasks", json={"title": "Write report"}, headers=auth_headers).json()
+    second = client.post(
+        "/api/tasks", json={"title": "Review", "priority": "high"}, headers=auth_headers
+    ).json()
+
+    tasks = client.get("/api/tasks", headers=auth_headers).json()
+    assert [t["id"] for t in tasks] == [second["id"], first["id"]]
+    high = client.get("/api/tasks?priority=high", headers=auth_headers).json()
+    assert [t["id"] for t in high] == [second["id"]]
+
+    updated = client.put(
+        f"/api/tasks/{first['id']}", json={"status": "completed"}, headers=auth_headers
+    ).json()
+    assert updated["status"] == "completed"
+    assert updated["completed_at"] is not None
+    completed = client.get("/api/tasks?status=completed", headers=auth_headers).json()
+    assert [t["id"] for t in completed] == [first["id"]]
+
+    assert client.delete(f"/api/tasks/{second['id']}", headers=auth_headers).status_code == 200
+    assert client.delete(f"/api/tasks/{second['id']}", headers=auth_headers).status_code == 404
+    assert client.put("/api/tasks/missing", json={"title": "x"}, headers=auth_headers).status_code == 404
+
+
+def test_notifications(client, auth_headers):
+    task = client.post(
+        "/api/tasks", json={"title": "Due task", "due_date": "2030-01-01T00:00:00"}, headers=auth_headers
+    ).json()
+    client.put(f"/api/tasks/{task['id']}", json={"status": "completed"}, headers=auth_headers)
+
+    notifications = client.get("/api/notifications", headers=auth_headers).json()
+    assert [n["type"] for n in notifications] == ["task_completed", "due_reminder"]
+
+    client.put(f"/api/notifications/{notifications[0]['id']}/read", headers=auth_headers)
+    assert client.get("/api/notifications", headers=auth_headers).json()[0]["read"] is True
+    assert client.delete(f"/api/notifications/{notifications[0]['id']}", headers=auth_headers).status_code == 200
+
+
+def test_include_archived_route_and_restore_on_edit(client, auth_headers, storage):
+    task = client.post("/api/tasks", json={"title": "Old"}, headers=auth_headers).json()
+    client.put(f"/api/tasks/{task['id']}", json={"status": "completed"}, headers=auth_headers)
+    old = datetime.utcnow() - timedelta(days=60)
+    storage.tasks.tasks.update(task["id"], {"completed_at": old, "updated_at": old})
+    assert asyncio.run(storage.tasks.archive_batch(datetime.utcnow() - timedelta(days=30), 10)) == 1
+
+    assert client.get("/api/tasks", headers=auth_headers).json() == []
+    archived = client.get("/api/tasks?include_archived=true", headers=auth_headers).json()
+    assert [t["id"] for t in archived] == [task["id"]]
+    assert client.get("/api/analytics", headers=auth_headers).json()["total_tasks"] == 1
+
+    client.put(f"/api/tasks/{task['id']}", json={"title": "Old, edited"}, headers=auth_headers)
+    assert [t["title"] for t in client.get("/api/tasks", headers=auth_headers).json()] == ["Old, edited"]